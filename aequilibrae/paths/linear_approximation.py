@@ -1,10 +1,12 @@
 import importlib.util as iutil
+from multiprocessing.dummy import Pool as ThreadPool
 import numpy as np
 from typing import List, Dict
 from warnings import warn
 from ..utils import WorkerThread
 from aequilibrae.paths.traffic_class import TrafficClass
 from aequilibrae.paths.results import AssignmentResults
+from aequilibrae.paths.graph import Graph
 from aequilibrae.paths.all_or_nothing import allOrNothing
 from aequilibrae import logger
 
@@ -12,10 +14,14 @@ try:
     from aequilibrae.paths.AoN import linear_combination, linear_combination_skims
     from aequilibrae.paths.AoN import triple_linear_combination, triple_linear_combination_skims
     from aequilibrae.paths.AoN import copy_one_dimension, copy_two_dimensions, copy_three_dimensions
+    from aequilibrae.paths.AoN import conjugate_reductions, biconjugate_reductions
+    from aequilibrae.paths.AoN import sum_axis1_aggregate, aggregate_one_dimension, conjugate_step_direction
+    from aequilibrae.paths.AoN import total_costs, sum_axis1_classes
 except ImportError as ie:
     logger.warning(f'Could not import procedures from the binary. {ie.args}')
 
 import scipy
+from scipy.special import comb
 
 if int(scipy.__version__.split('.')[1]) >= 3:
     from scipy.optimize import root_scalar
@@ -79,6 +85,10 @@ class LinearApproximation(WorkerThread):
         self.vdf_parameters = assig_spec.vdf_parameters
 
         self.iter = 0
+        self.class_cores = self.cores
+        self.pool = None
+        self.time_skims = []  # type: List[np.ndarray]
+        self.graphs = []  # type: List[Graph]
         self.rgap = np.inf
         self.stepsize = 1.0
         self.conjugate_stepsize = 0.0
@@ -107,15 +117,44 @@ class LinearApproximation(WorkerThread):
         self.congested_time = assig_spec.congested_time
         self.vdf_der = np.array(assig_spec.congested_time, copy=True)
         self.congested_value = np.array(assig_spec.congested_time, copy=True)
+        self.step_direction_flow = np.zeros_like(self.congested_time)
+        self.aon_total_flow = np.zeros_like(self.congested_time)
+        # Scratch arrays for the line search along the descent direction
+        self.flow_delta = np.zeros_like(self.congested_time)
+        self.step_flow = np.zeros_like(self.congested_time)
+
+        # Per-link reductions over user classes used when computing the conjugate direction
+        self.prev_dir_minus_current_sol = np.zeros_like(self.congested_time)
+        self.aon_minus_current_sol = np.zeros_like(self.congested_time)
+        self.aon_minus_prev_dir = np.zeros_like(self.congested_time)
+        # mu numerator, mu denominator, nu numerator and nu denominator for the biconjugate direction
+        self.biconjugate_terms = np.zeros(4)
+        # AoN and current solution total costs for the relative gap
+        self.total_costs = np.zeros(2)
+
+        # With BPR and integer exponents, the derivative of the objective function along the descent direction is a
+        # polynomial on the stepsize, so we can find its root directly instead of evaluating the VDF repeatedly
+        self.bpr_exponents = None  # type: List[tuple]
+        if self.vdf.function == "BPR":
+            beta = self.vdf_parameters[1]
+            if np.all(beta >= 1) and np.all(beta == np.round(beta)):
+                exponents = np.unique(beta)
+                if exponents.shape[0] == 1:
+                    self.bpr_exponents = [(int(exponents[0]), slice(None))]
+                else:
+                    self.bpr_exponents = [(int(b), beta == b) for b in exponents]
+
+        # Which root finder scipy offers does not change, so we pick the stepsize search only once
+        self.__stepsize_impl = self.__stepsize_modern if recent_scipy else self.__stepsize_legacy
 
         self.step_direction = {}  # type: Dict[AssignmentResults]
         self.previous_step_direction = {}  # type: Dict[AssignmentResults]
         self.pre_previous_step_direction = {}  # type: Dict[AssignmentResults]
 
-        for c in self.traffic_classes:
-            r = AssignmentResults()
-            r.prepare(c.graph, c.matrix)
-            self.step_direction[c.mode] = r
+        # The number of skims is fixed when each class' results are prepared, so we check it only once
+        self.has_skims = {c.mode: c.results.num_skims > 0 for c in self.traffic_classes}  # type: Dict[bool]
+        self.step_direction_loads = None  # type: np.ndarray
+        self.class_pces = None  # type: np.ndarray
 
         if self.algorithm in ['cfw', 'bfw']:
 
@@ -132,6 +171,19 @@ class LinearApproximation(WorkerThread):
                 r.prepare(c.graph, c.matrix)
                 self.pre_previous_step_direction[c.mode] = r
 
+            # When all classes have the same dimensions, their step direction link loads are kept in a single
+            # (class, link, user class) array, so the aggregate step direction flow is computed in a single pass
+            shapes = {self.step_direction[c.mode].link_loads.shape for c in self.traffic_classes}
+            if len(shapes) == 1:
+                self.step_direction_loads = np.zeros((self.num_classes,) + shapes.pop())
+                for i, c in enumerate(self.traffic_classes):
+                    self.step_direction[c.mode].link_loads = self.step_direction_loads[i, :, :]
+                self.class_pces = np.zeros(self.num_classes)
+        else:
+            # For MSA and Frank-Wolfe the step direction is always the AoN itself, so we don't need a copy of it
+            for c in self.traffic_classes:
+                self.step_direction[c.mode] = c._aon_results
+
     def calculate_conjugate_stepsize(self):
         self.vdf.apply_derivative(
             self.vdf_der, self.fw_total_flow, self.capacity, self.free_flow_tt, *self.vdf_parameters
@@ -144,22 +196,16 @@ class LinearApproximation(WorkerThread):
         denominator = 0.0
         for c in self.traffic_classes:
             stp_dir = self.step_direction[c.mode]
-            prev_dir_minus_current_sol = np.sum(stp_dir.link_loads[:, :] - c.results.link_loads[:, :], axis=1)
-            aon_minus_current_sol = np.sum(c._aon_results.link_loads[:, :] - c.results.link_loads[:, :], axis=1)
-            aon_minus_prev_dir = np.sum(c._aon_results.link_loads[:, :] - stp_dir.link_loads[:, :], axis=1)
-            numerator += prev_dir_minus_current_sol * aon_minus_current_sol
-            denominator += prev_dir_minus_current_sol * aon_minus_prev_dir
+            conjugate_reductions(self.prev_dir_minus_current_sol, self.aon_minus_current_sol, self.aon_minus_prev_dir,
+                                 stp_dir.link_loads, c.results.link_loads, c._aon_results.link_loads, self.cores)
+            numerator += self.prev_dir_minus_current_sol * self.aon_minus_current_sol
+            denominator += self.prev_dir_minus_current_sol * self.aon_minus_prev_dir
 
-        numerator = np.sum(numerator * self.vdf_der)
-        denominator = np.sum(denominator * self.vdf_der)
+        numerator = np.dot(numerator, self.vdf_der)
+        denominator = np.dot(denominator, self.vdf_der)
 
         alpha = numerator / denominator
-        if alpha < 0.0:
-            self.stepdirection = 0.0
-        elif alpha > self.conjugate_direction_max:
-            self.stepdirection = self.conjugate_direction_max
-        else:
-            self.conjugate_stepsize = alpha
+        self.conjugate_stepsize = min(max(alpha, 0.0), self.conjugate_direction_max)
 
     def calculate_biconjugate_direction(self):
         self.vdf.apply_derivative(
@@ -169,33 +215,19 @@ class LinearApproximation(WorkerThread):
         # TODO: This should be a sum over all supernetwork links, it's not tested for multi-class yet
         # if we can assume that all links appear in the subnetworks, then this is correct, otherwise
         # this needs more work
-        mu_numerator = 0.0
-        mu_denominator = 0.0
-        nu_nom = 0.0
-        nu_denom = 0.0
+        self.biconjugate_terms.fill(0)
         for c in self.traffic_classes:
-            x_ = np.sum((self.step_direction[c.mode].link_loads[:, :] * self.stepsize
-                         + self.previous_step_direction[c.mode].link_loads[:, :] * (1.0 - self.stepsize)
-                         - c.results.link_loads[:, :]), axis=1)
-
-            y_ = np.sum(c._aon_results.link_loads[:, :] - c.results.link_loads[:, :], axis=1)
-            z_ = np.sum(self.step_direction[c.mode].link_loads[:, :] - c.results.link_loads[:, :], axis=1)
-            mu_numerator += x_ * y_
-            mu_denominator += x_ * np.sum(
-                self.previous_step_direction[c.mode].link_loads - self.step_direction[c.mode].link_loads[:, :], axis=1)
-            nu_nom += z_ * y_
-            nu_denom += z_ * z_
-
-        mu_numerator = np.sum(mu_numerator * self.vdf_der)
-        mu_denominator = np.sum(mu_denominator * self.vdf_der)
+            biconjugate_reductions(self.biconjugate_terms, self.vdf_der, self.step_direction[c.mode].link_loads,
+                                   self.previous_step_direction[c.mode].link_loads, c.results.link_loads,
+                                   c._aon_results.link_loads, self.stepsize, self.cores)
+
+        mu_numerator, mu_denominator, nu_nom, nu_denom = self.biconjugate_terms
         if mu_denominator == 0.0:
             mu = 0.0
         else:
             mu = -mu_numerator / mu_denominator
             mu = max(0.0, mu)
 
-        nu_nom = np.sum(nu_nom * self.vdf_der)
-        nu_denom = np.sum(nu_denom * self.vdf_der)
         if nu_denom == 0.0:
             nu = 0.0
         else:
@@ -208,8 +240,6 @@ class LinearApproximation(WorkerThread):
 
     def __calculate_step_direction(self):
         """Calculates step direction depending on the method"""
-        sd_flows = []
-
         # 2nd iteration is a fw step. if the previous step replaced the aggregated
         # solution so far, we need to start anew.
         if (
@@ -223,62 +253,81 @@ class LinearApproximation(WorkerThread):
             self.do_fw_step = False
             self.do_conjugate_step = True
             self.conjugate_stepsize = 0.0
-            for c in self.traffic_classes:
-                aon_res = c._aon_results
-                stp_dir_res = self.step_direction[c.mode]
-                copy_two_dimensions(stp_dir_res.link_loads, aon_res.link_loads, self.cores)
-                if c.results.num_skims > 0:
-                    copy_three_dimensions(stp_dir_res.skims.matrix_view, aon_res.skims.matrix_view, self.cores)
-                    aon_res.total_flows()
-                sd_flows.append(aon_res.total_link_loads * c.pce)
+            if self.algorithm in ['cfw', 'bfw']:
+                self.__map_classes(self.__fw_direction)
+            # AoN totals were aggregated right after the AoN itself
+            copy_one_dimension(self.step_direction_flow, self.aon_total_flow, self.cores)
 
         # 3rd iteration is cfw. also, if we had to reset direction search we need a cfw step before bfw
         elif (self.iter == 3) or (self.do_conjugate_step) or (self.algorithm == "cfw"):
             self.do_conjugate_step = False
             self.calculate_conjugate_stepsize()
+            self.__map_classes(self.__conjugate_direction)
+            # Link totals for each class were computed together with their new step direction
+            self.step_direction_flow.fill(0)
             for c in self.traffic_classes:
-                stp_dr = self.step_direction[c.mode]
-                pre_previous = self.pre_previous_step_direction[c.mode]
-                copy_two_dimensions(pre_previous.link_loads, stp_dr.link_loads, self.cores)
-                if c.results.num_skims > 0:
-                    copy_three_dimensions(pre_previous.skims.matrix_view, stp_dr.skims.matrix_view, self.cores)
-
-                linear_combination(stp_dr.link_loads, stp_dr.link_loads,
-                                   c._aon_results.link_loads, self.conjugate_stepsize, self.cores)
-
-                if c.results.num_skims > 0:
-                    linear_combination_skims(stp_dr.skims.matrix_view, stp_dr.skims.matrix_view,
-                                             c._aon_results.skims.matrix_view, self.conjugate_stepsize, self.cores)
-
-                sd_flows.append(np.sum(stp_dr.link_loads, axis=1) * c.pce)
+                aggregate_one_dimension(self.step_direction_flow, self.step_direction[c.mode].total_link_loads, c.pce,
+                                        self.cores)
         # biconjugate
         else:
             self.calculate_biconjugate_direction()
-            # deep copy because we overwrite step_direction but need it on next iteration
+            self.__map_classes(self.__biconjugate_direction)
+            if self.step_direction_loads is not None:
+                sum_axis1_classes(self.step_direction_flow, self.step_direction_loads, self.class_pces, self.cores)
+            else:
+                self.step_direction_flow.fill(0)
+                for c in self.traffic_classes:
+                    stp_dir = self.step_direction[c.mode]
+                    sum_axis1_aggregate(stp_dir.total_link_loads, self.step_direction_flow, stp_dir.link_loads,
+                                        c.pce, self.cores)
+
+    def __fw_direction(self, c: TrafficClass):
+        aon_res = c._aon_results
+        stp_dir_res = self.step_direction[c.mode]
+        copy_two_dimensions(stp_dir_res.link_loads, aon_res.link_loads, self.class_cores)
+        if self.has_skims[c.mode]:
+            copy_three_dimensions(stp_dir_res.skims.matrix_view, aon_res.skims.matrix_view, self.class_cores)
+
+    def __conjugate_direction(self, c: TrafficClass):
+        stp_dr = self.step_direction[c.mode]
+        pre_previous = self.pre_previous_step_direction[c.mode]
+        conjugate_step_direction(pre_previous.link_loads, stp_dr.link_loads, c._aon_results.link_loads,
+                                 stp_dr.total_link_loads, self.conjugate_stepsize, self.class_cores)
+
+        if self.has_skims[c.mode]:
+            copy_three_dimensions(pre_previous.skims.matrix_view, stp_dr.skims.matrix_view, self.class_cores)
+            linear_combination_skims(stp_dr.skims.matrix_view, stp_dr.skims.matrix_view,
+                                     c._aon_results.skims.matrix_view, self.conjugate_stepsize, self.class_cores)
+
+    def __biconjugate_direction(self, c: TrafficClass):
+        # deep copy because we overwrite step_direction but need it on next iteration
+        ppst = self.pre_previous_step_direction[c.mode]  # type: AssignmentResults
+        prev_stp_dir = self.previous_step_direction[c.mode]  # type: AssignmentResults
+        stp_dir = self.step_direction[c.mode]  # type: AssignmentResults
+
+        copy_two_dimensions(ppst.link_loads, stp_dir.link_loads, self.class_cores)
+        if self.has_skims[c.mode]:
+            copy_three_dimensions(ppst.skims.matrix_view, stp_dir.skims.matrix_view, self.class_cores)
+
+        triple_linear_combination(stp_dir.link_loads, c._aon_results.link_loads, stp_dir.link_loads,
+                                  prev_stp_dir.link_loads, self.betas, self.class_cores)
+
+        if self.has_skims[c.mode]:
+            triple_linear_combination_skims(stp_dir.skims.matrix_view, c._aon_results.skims.matrix_view,
+                                            stp_dir.skims.matrix_view, prev_stp_dir.skims.matrix_view,
+                                            self.betas, self.class_cores)
+
+        copy_two_dimensions(prev_stp_dir.link_loads, ppst.link_loads, self.class_cores)
+        if self.has_skims[c.mode]:
+            copy_three_dimensions(prev_stp_dir.skims.matrix_view, ppst.skims.matrix_view, self.class_cores)
+
+    def __map_classes(self, func) -> None:
+        """Applies func to each traffic class, concurrently if there is more than one class"""
+        if self.pool is None:
             for c in self.traffic_classes:
-                ppst = self.pre_previous_step_direction[c.mode]  # type: AssignmentResults
-                prev_stp_dir = self.previous_step_direction[c.mode]  # type: AssignmentResults
-                stp_dir = self.step_direction[c.mode]  # type: AssignmentResults
-
-                copy_two_dimensions(ppst.link_loads, stp_dir.link_loads, self.cores)
-                if c.results.num_skims > 0:
-                    copy_three_dimensions(ppst.skims.matrix_view, stp_dir.skims.matrix_view, self.cores)
-
-                triple_linear_combination(stp_dir.link_loads, c._aon_results.link_loads, stp_dir.link_loads,
-                                          prev_stp_dir.link_loads, self.betas, self.cores)
-
-                if c.results.num_skims > 0:
-                    triple_linear_combination_skims(stp_dir.skims.matrix_view, c._aon_results.skims.matrix_view,
-                                                    stp_dir.skims.matrix_view, prev_stp_dir.skims.matrix_view,
-                                                    self.betas, self.cores)
-
-                sd_flows.append(np.sum(stp_dir.link_loads, axis=1) * c.pce)
-
-                copy_two_dimensions(prev_stp_dir.link_loads, ppst.link_loads, self.cores)
-                if c.results.num_skims > 0:
-                    copy_three_dimensions(prev_stp_dir.skims.matrix_view, ppst.skims.matrix_view, self.cores)
-
-        self.step_direction_flow = np.sum(sd_flows, axis=0)
+                func(c)
+        else:
+            self.pool.map(func, self.traffic_classes)
 
     def doWork(self):
         self.execute()
@@ -287,93 +336,143 @@ class LinearApproximation(WorkerThread):
         for c in self.traffic_classes:
             c.graph.set_graph(self.time_field)
 
-        logger.info(f"{self.algorithm} Assignment STATS")
-        logger.info("Iteration, RelativeGap, stepsize")
-        for self.iter in range(1, self.max_iter + 1):
-            self.iteration_issue = []
-            if pyqt:
-                self.equilibration.emit(['rgap', self.rgap])
-                self.equilibration.emit(['iterations', self.iter])
-            flows = []
-            aon_flows = []
+        # PCEs can be changed after the algorithm is set, so we read them for every run
+        if self.class_pces is not None:
+            self.class_pces[:] = [c.pce for c in self.traffic_classes]
 
+        # Graphs shared by several classes appear only once
+        self.graphs = []
+        for c in self.traffic_classes:
+            if not any(c.graph is g for g in self.graphs):
+                self.graphs.append(c.graph)
+
+        # Views into the graph skims that hold travel time, which we update with congested times on every iteration.
+        # Graphs that share their skims appear only once
+        self.time_skims = []
+        skim_arrays = []
+        for g in self.graphs:
+            if self.time_field in g.skim_fields and not any(g.skims is s for s in skim_arrays):
+                skim_arrays.append(g.skims)
+                self.time_skims.append(g.skims[:, g.skim_fields.index(self.time_field)])
+
+        # Classes are independent from each other, so we process up to one class per core concurrently and split the
+        # cores among the classes being processed
+        workers = min(self.num_classes, self.cores)
+        self.class_cores = max(1, self.cores // workers)
+        # Each class' AoN also gets only its share of the cores for this run, so concurrent AoNs do not oversubscribe
+        # the CPU nor allocate path-finding scratch for all the cores in the system
+        aon_cores = []
+        if workers > 1:
+            self.pool = ThreadPool(workers)
             for c in self.traffic_classes:
-                aon = allOrNothing(c.matrix, c.graph, c._aon_results)
-                if pyqt:
-                    aon.assignment.connect(self.signal_handler)
-                aon.execute()
-                c._aon_results.total_flows()
-                aon_flows.append(c._aon_results.total_link_loads * c.pce)
-            self.aon_total_flow = np.sum(aon_flows, axis=0)
+                aon_cores.append((c._aon_results, c._aon_results.cores))
+                c._aon_results.cores = self.class_cores
 
-            if self.iter == 1:
-                for c in self.traffic_classes:
-                    copy_two_dimensions(c.results.link_loads, c._aon_results.link_loads, self.cores)
-                    c.results.total_flows()
-                    copy_one_dimension(c.results.total_link_loads, c._aon_results.total_link_loads, self.cores)
-                    if c.results.num_skims > 0:
-                        copy_three_dimensions(c.results.skims.matrix_view, c._aon_results.skims.matrix_view, self.cores)
-                    flows.append(c.results.total_link_loads * c.pce)
-            else:
-                self.__calculate_step_direction()
-                self.calculate_stepsize()
+        try:
+            logger.info(f"{self.algorithm} Assignment STATS")
+            logger.info("Iteration, RelativeGap, stepsize")
+            for self.iter in range(1, self.max_iter + 1):
+                self.iteration_issue = []
+                if pyqt:
+                    self.equilibration.emit(['rgap', self.rgap])
+                    self.equilibration.emit(['iterations', self.iter])
+                self.__map_classes(self.__all_or_nothing)
+                self.aon_total_flow.fill(0)
                 for c in self.traffic_classes:
-                    stp_dir = self.step_direction[c.mode]
-                    cls_res = c.results
-                    linear_combination(cls_res.link_loads, stp_dir.link_loads, cls_res.link_loads, self.stepsize,
-                                       self.cores)
-                    if cls_res.num_skims > 0:
-                        linear_combination_skims(cls_res.skims.matrix_view,
-                                                 stp_dir.skims.matrix_view,
-                                                 cls_res.skims.matrix_view,
-                                                 self.stepsize,
-                                                 self.cores)
-                    cls_res.total_flows()
-                    flows.append(cls_res.total_link_loads * c.pce)
-
-            self.fw_total_flow = np.sum(flows, axis=0)
-
-            # Check convergence
-            # This needs to be done with the current costs, and not the future ones
-            converged = False
-            if self.iter > 1:
-                converged = self.check_convergence()
-
-            self.convergence_report['iteration'].append(self.iter)
-            self.convergence_report['rgap'].append(self.rgap)
-            self.convergence_report['warnings'].append('; '.join(self.iteration_issue))
-            self.convergence_report['alpha'].append(self.stepsize)
+                    aon_res = c._aon_results
+                    sum_axis1_aggregate(aon_res.total_link_loads, self.aon_total_flow, aon_res.link_loads, c.pce,
+                                        self.cores)
 
-            if self.algorithm == 'bfw':
-                self.convergence_report['beta0'].append(self.betas[0])
-                self.convergence_report['beta1'].append(self.betas[1])
-                self.convergence_report['beta2'].append(self.betas[2])
-
-            logger.info(f"{self.iter},{self.rgap},{self.stepsize}")
-            if converged:
-                if self.steps_below >= self.steps_below_needed_to_terminate:
-                    break
+                if self.iter == 1:
+                    self.__map_classes(self.__copy_aon_solution)
+                    copy_one_dimension(self.fw_total_flow, self.aon_total_flow, self.cores)
                 else:
-                    self.steps_below += 1
-
-            self.vdf.apply_vdf(
-                self.congested_time, self.fw_total_flow, self.capacity, self.free_flow_tt, *self.vdf_parameters
-            )
-
-            for c in self.traffic_classes:
-                c.graph.cost = self.congested_time
-                if self.time_field in c.graph.skim_fields:
-                    idx = c.graph.skim_fields.index(self.time_field)
-                    c.graph.skims[:, idx] = self.congested_time[:]
-                c._aon_results.reset()
-
-        if self.rgap > self.rgap_target:
-            logger.error(f"Desired RGap of {self.rgap_target} was NOT reached")
-        logger.info(f"{self.algorithm} Assignment finished. {self.iter} iterations and {self.rgap} final gap")
+                    self.__calculate_step_direction()
+                    self.calculate_stepsize()
+                    # A null step leaves the current solution, and therefore its totals, unchanged
+                    if self.stepsize > 0:
+                        self.__map_classes(self.__update_solution)
+                        self.fw_total_flow.fill(0)
+                        for c in self.traffic_classes:
+                            cls_res = c.results
+                            sum_axis1_aggregate(cls_res.total_link_loads, self.fw_total_flow, cls_res.link_loads, c.pce,
+                                                self.cores)
+
+                # Check convergence
+                # This needs to be done with the current costs, and not the future ones
+                converged = False
+                if self.iter > 1:
+                    converged = self.check_convergence()
+
+                self.convergence_report['iteration'].append(self.iter)
+                self.convergence_report['rgap'].append(self.rgap)
+                self.convergence_report['warnings'].append('; '.join(self.iteration_issue))
+                self.convergence_report['alpha'].append(self.stepsize)
+
+                if self.algorithm == 'bfw':
+                    self.convergence_report['beta0'].append(self.betas[0])
+                    self.convergence_report['beta1'].append(self.betas[1])
+                    self.convergence_report['beta2'].append(self.betas[2])
+
+                logger.info(f"{self.iter},{self.rgap},{self.stepsize}")
+                if converged:
+                    if self.steps_below >= self.steps_below_needed_to_terminate:
+                        break
+                    else:
+                        self.steps_below += 1
+
+                self.vdf.apply_vdf(
+                    self.congested_time, self.fw_total_flow, self.capacity, self.free_flow_tt, *self.vdf_parameters
+                )
+
+                for skim in self.time_skims:
+                    np.copyto(skim, self.congested_time)
+
+                # There is no need to reset the AoN results between iterations, as the AoN writes its link loads to a
+                # brand new array and overwrites all skims and totals
+                # The VDF writes congested times in place, so graphs only need to be pointed to them once
+                for g in self.graphs:
+                    if g.cost is not self.congested_time:
+                        g.cost = self.congested_time
+
+            if self.rgap > self.rgap_target:
+                logger.error(f"Desired RGap of {self.rgap_target} was NOT reached")
+            logger.info(f"{self.algorithm} Assignment finished. {self.iter} iterations and {self.rgap} final gap")
+            if pyqt:
+                self.equilibration.emit(['rgap', self.rgap])
+                self.equilibration.emit(['iterations', self.iter])
+                self.equilibration.emit(['finished_threaded_procedure'])
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool.join()
+                self.pool = None
+            for aon_res, cores in aon_cores:
+                aon_res.cores = cores
+
+    def __all_or_nothing(self, c: TrafficClass):
+        aon = allOrNothing(c.matrix, c.graph, c._aon_results)
         if pyqt:
-            self.equilibration.emit(['rgap', self.rgap])
-            self.equilibration.emit(['iterations', self.iter])
-            self.equilibration.emit(['finished_threaded_procedure'])
+            aon.assignment.connect(self.signal_handler)
+        aon.execute()
+
+    def __copy_aon_solution(self, c: TrafficClass):
+        copy_two_dimensions(c.results.link_loads, c._aon_results.link_loads, self.class_cores)
+        copy_one_dimension(c.results.total_link_loads, c._aon_results.total_link_loads, self.class_cores)
+        if self.has_skims[c.mode]:
+            copy_three_dimensions(c.results.skims.matrix_view, c._aon_results.skims.matrix_view, self.class_cores)
+
+    def __update_solution(self, c: TrafficClass):
+        stp_dir = self.step_direction[c.mode]
+        cls_res = c.results
+        linear_combination(cls_res.link_loads, stp_dir.link_loads, cls_res.link_loads, self.stepsize,
+                           self.class_cores)
+        if self.has_skims[c.mode]:
+            linear_combination_skims(cls_res.skims.matrix_view,
+                                     stp_dir.skims.matrix_view,
+                                     cls_res.skims.matrix_view,
+                                     self.stepsize,
+                                     self.class_cores)
 
     def calculate_stepsize(self):
         """Calculate optimal stepsize in descent direction"""
@@ -381,25 +480,11 @@ class LinearApproximation(WorkerThread):
             self.stepsize = 1.0 / self.iter
             return
 
-        def derivative_of_objective(stepsize):
-            x = self.fw_total_flow + stepsize * (self.step_direction_flow - self.fw_total_flow)
-
-            self.vdf.apply_vdf(self.congested_value, x, self.capacity, self.free_flow_tt, *self.vdf_parameters)
-            return np.sum(self.congested_value * (self.step_direction_flow - self.fw_total_flow))
+        np.subtract(self.step_direction_flow, self.fw_total_flow, out=self.flow_delta)
 
         try:
-            if recent_scipy:
-                min_res = root_scalar(derivative_of_objective, bracket=[0, 1])
-                self.stepsize = min_res.root
-                if not min_res.converged:
-                    logger.warning("Descent direction stepsize finder is not converged")
-            else:
-                min_res = root_scalar(derivative_of_objective, 1 / self.iter)
-                if not min_res.success:
-                    logger.warning("Descent direction stepsize finder is not converged")
-                self.stepsize = min_res.x[0]
-                if self.stepsize <= 0.0 or self.stepsize >= 1.0:
-                    raise ValueError('wrong root')
+            if self.bpr_exponents is None or not self.__polynomial_stepsize():
+                self.__stepsize_impl()
 
             self.conjugate_failed = False
 
@@ -411,7 +496,7 @@ class LinearApproximation(WorkerThread):
             # seems to work well in practice.
             if self.algorithm == 'bfw':
                 self.betas.fill(-1)
-            if derivative_of_objective(0.0) < derivative_of_objective(1.0):
+            if self.__derivative_of_objective(0.0) < self.__derivative_of_objective(1.0):
                 if self.algorithm == "frank-wolfe" or self.conjugate_failed:
                     msa_step = 1.0 / self.iter
                     logger.warning(f"# Alert: Adding {msa_step} to stepsize to make it non-zero")
@@ -432,10 +517,74 @@ class LinearApproximation(WorkerThread):
 
         assert 0 <= self.stepsize <= 1.0
 
+    def __derivative_of_objective(self, stepsize):
+        np.multiply(self.flow_delta, stepsize, out=self.step_flow)
+        np.add(self.step_flow, self.fw_total_flow, out=self.step_flow)
+
+        self.vdf.apply_vdf(self.congested_value, self.step_flow, self.capacity, self.free_flow_tt,
+                           *self.vdf_parameters)
+        return np.dot(self.congested_value, self.flow_delta)
+
+    def __stepsize_modern(self):
+        min_res = root_scalar(self.__derivative_of_objective, bracket=[0, 1])
+        self.stepsize = min_res.root
+        if not min_res.converged:
+            logger.warning("Descent direction stepsize finder is not converged")
+
+    def __stepsize_legacy(self):
+        min_res = root_scalar(self.__derivative_of_objective, 1 / self.iter)
+        if not min_res.success:
+            logger.warning("Descent direction stepsize finder is not converged")
+        self.stepsize = min_res.x[0]
+        if self.stepsize <= 0.0 or self.stepsize >= 1.0:
+            raise ValueError('wrong root')
+
+    def __polynomial_stepsize(self) -> bool:
+        """Finds the optimal stepsize as the root of the polynomial derivative of the objective for BPR
+
+        Expects *flow_delta* to hold the difference between step direction and current flows. Returns False if no
+        suitable root could be found, in which case the stepsize was not changed
+        """
+        alpha = self.vdf_parameters[0]
+        delta = self.flow_delta
+
+        # Coefficients in increasing order of power of the stepsize
+        coefficients = np.zeros(max([b for b, _ in self.bpr_exponents]) + 1)
+        coefficients[0] = np.dot(self.free_flow_tt, delta)
+        for exponent, links in self.bpr_exponents:
+            u = self.fw_total_flow[links] / self.capacity[links]
+            v = delta[links] / self.capacity[links]
+            u_powers = [np.ones_like(u)]
+            for _ in range(exponent):
+                u_powers.append(u_powers[-1] * u)
+            weighted_v_power = delta[links] * self.free_flow_tt[links] * alpha[links]
+            for k in range(exponent + 1):
+                coefficients[k] += comb(exponent, k, exact=True) * np.dot(weighted_v_power, u_powers[exponent - k])
+                weighted_v_power *= v
+
+        if not np.all(np.isfinite(coefficients)):
+            return False
+
+        # Same behaviour as the bracketed root finder, which returns the start of the bracket if it is already a root
+        # and raises if there is no sign change within [0, 1]
+        if coefficients[0] == 0:
+            self.stepsize = 0.0
+            return True
+        if np.sign(coefficients[0]) * np.sign(coefficients.sum()) > 0:
+            raise ValueError('f(a) and f(b) must have different signs')
+
+        roots = np.polynomial.polynomial.polyroots(coefficients)
+        roots = roots[(roots.real >= 0) & (roots.real <= 1)]
+        if roots.shape[0] == 0:
+            return False
+
+        self.stepsize = float(roots.real[np.argmin(np.abs(roots.imag))])
+        return True
+
     def check_convergence(self):
         """Calculate relative gap and return True if it is smaller than desired precision"""
-        aon_cost = np.sum(self.congested_time * self.aon_total_flow)
-        current_cost = np.sum(self.congested_time * self.fw_total_flow)
+        total_costs(self.total_costs, self.congested_time, self.aon_total_flow, self.fw_total_flow, self.cores)
+        aon_cost, current_cost = self.total_costs
         self.rgap = abs(current_cost - aon_cost) / current_cost
         if self.rgap_target >= self.rgap:
             return True
@@ -26,6 +26,40 @@ cpdef void sum_axis1_cython(double[:] totals,
 
 
 
+def sum_axis1_aggregate(totals, aggregate, multiples, scale, cores):
+    cdef double sc
+    cdef int c
+    c = cores
+
+    sc = float(scale)
+    cdef double [:] totals_view = totals
+    cdef double [:] aggregate_view = aggregate
+    cdef double [:, :] multiples_view = multiples
+
+    sum_axis1_aggregate_cython(totals_view, aggregate_view, multiples_view, sc, c)
+
+
+@cython.wraparound(False)
+@cython.embedsignature(True)
+@cython.boundscheck(False)
+cpdef void sum_axis1_aggregate_cython(double[:] totals,
+                                      double[:] aggregate,
+                                      double[:, :] multiples,
+                                      double scale,
+                                      int cores):
+  # Same as sum_axis1, but also adds the totals multiplied by scale to aggregate
+  cdef long long i, j
+  cdef long long l = totals.shape[0]
+  cdef long long k = multiples.shape[1]
+
+  for i in prange(l, nogil=True, num_threads=cores):
+      totals[i] = 0
+      for j in range(k):
+          totals[i] += multiples[i, j]
+      aggregate[i] += scale * totals[i]
+
+
+
 
 def linear_combination(results, array1, array2, stepsize, cores):
     cdef double stpsz
@@ -51,10 +85,11 @@ cpdef void linear_combination_cython(double stepsize,
     cdef long long i, j
     cdef long long l = results.shape[0]
     cdef long long k = results.shape[1]
+    cdef double complement = 1.0 - stepsize
 
-    for j in range(k):
-        for i in prange(l, nogil=True, num_threads=cores):
-            results[i, j] = array1[i, j] * stepsize + array2[i, j] * (1.0 - stepsize)
+    for i in prange(l, nogil=True, num_threads=cores):
+        for j in range(k):
+            results[i, j] = array1[i, j] * stepsize + array2[i, j] * complement
 
 
 
@@ -83,11 +118,12 @@ cpdef void linear_combination_skims_cython(double stepsize,
     cdef long long a = results.shape[0]
     cdef long long b = results.shape[1]
     cdef long long c = results.shape[2]
+    cdef double complement = 1.0 - stepsize
 
-    for k in range(c):
+    for i in prange(a, nogil=True, num_threads=cores):
         for j in range(b):
-            for i in prange(a, nogil=True, num_threads=cores):
-                results[i, j, k] = array1[i, j, k] * stepsize + array2[i, j, k] * (1.0 - stepsize)
+            for k in range(c):
+                results[i, j, k] = array1[i, j, k] * stepsize + array2[i, j, k] * complement
 
 
 
@@ -117,10 +153,13 @@ cpdef void triple_linear_combination_cython(double [:] stepsizes,
     cdef long long i, j
     cdef long long l = results.shape[0]
     cdef long long k = results.shape[1]
+    cdef double beta0 = stepsizes[0]
+    cdef double beta1 = stepsizes[1]
+    cdef double beta2 = stepsizes[2]
 
-    for j in range(k):
-        for i in prange(l, nogil=True, num_threads=cores):
-            results[i, j] = array1[i, j] * stepsizes[0] + array2[i, j] * stepsizes[1]  + array3[i, j] * stepsizes[2]
+    for i in prange(l, nogil=True, num_threads=cores):
+        for j in range(k):
+            results[i, j] = array1[i, j] * beta0 + array2[i, j] * beta1 + array3[i, j] * beta2
 
 
 
@@ -149,12 +188,14 @@ cpdef void triple_linear_combination_cython_skims(double [:] stepsizes,
     cdef long long a = results.shape[0]
     cdef long long b = results.shape[1]
     cdef long long c = results.shape[2]
+    cdef double beta0 = stepsizes[0]
+    cdef double beta1 = stepsizes[1]
+    cdef double beta2 = stepsizes[2]
 
-    for k in range(c):
+    for i in prange(a, nogil=True, num_threads=cores):
         for j in range(b):
-            for i in prange(a, nogil=True, num_threads=cores):
-                results[i, j, k] = array1[i, j, k] * stepsizes[0] + array2[i, j, k] * stepsizes[1]  + \
-                                   array3[i, j, k] * stepsizes[2]
+            for k in range(c):
+                results[i, j, k] = array1[i, j, k] * beta0 + array2[i, j, k] * beta1 + array3[i, j, k] * beta2
 
 
 
@@ -201,8 +242,8 @@ cpdef void copy_two_dimensions_cython(double[:, :] target,
     cdef long long l = target.shape[0]
     cdef long long k = target.shape[1]
 
-    for j in range(k):
-        for i in prange(l, nogil=True, num_threads=cores):
+    for i in prange(l, nogil=True, num_threads=cores):
+        for j in range(k):
             target[i, j] = source[i, j]
 
 
@@ -229,7 +270,243 @@ cpdef void copy_three_dimensions_cython(double[:, :, :] target,
     cdef long long b = target.shape[1]
     cdef long long c = target.shape[2]
 
-    for k in range(c):
+    for i in prange(a, nogil=True, num_threads=cores):
         for j in range(b):
-            for i in prange(a, nogil=True, num_threads=cores):
+            for k in range(c):
                 target[i, j, k] = source[i, j, k]
+
+
+
+def conjugate_reductions(prev_minus_current, aon_minus_current, aon_minus_prev, step_direction, current, aon, cores):
+    cdef int c
+    c = cores
+
+    cdef double [:] prev_minus_current_view = prev_minus_current
+    cdef double [:] aon_minus_current_view = aon_minus_current
+    cdef double [:] aon_minus_prev_view = aon_minus_prev
+    cdef double [:, :] step_direction_view = step_direction
+    cdef double [:, :] current_view = current
+    cdef double [:, :] aon_view = aon
+
+    conjugate_reductions_cython(prev_minus_current_view, aon_minus_current_view, aon_minus_prev_view,
+                                step_direction_view, current_view, aon_view, c)
+
+
+@cython.wraparound(False)
+@cython.embedsignature(True)
+@cython.boundscheck(False)
+cpdef void conjugate_reductions_cython(double[:] prev_minus_current,
+                                       double[:] aon_minus_current,
+                                       double[:] aon_minus_prev,
+                                       double[:, :] step_direction,
+                                       double[:, :] current,
+                                       double[:, :] aon,
+                                       int cores):
+    cdef long long i, j
+    cdef long long l = step_direction.shape[0]
+    cdef long long k = step_direction.shape[1]
+
+    for i in prange(l, nogil=True, num_threads=cores):
+        prev_minus_current[i] = 0
+        aon_minus_current[i] = 0
+        aon_minus_prev[i] = 0
+        for j in range(k):
+            prev_minus_current[i] += step_direction[i, j] - current[i, j]
+            aon_minus_current[i] += aon[i, j] - current[i, j]
+            aon_minus_prev[i] += aon[i, j] - step_direction[i, j]
+
+
+
+def biconjugate_reductions(reductions, vdf_der, step_direction, previous_step_direction, current, aon, stepsize, cores):
+    cdef double stpsz
+    cdef int c
+    c = cores
+
+    stpsz = float(stepsize)
+    cdef double [:] reductions_view = reductions
+    cdef double [:] vdf_der_view = vdf_der
+    cdef double [:, :] step_direction_view = step_direction
+    cdef double [:, :] previous_step_direction_view = previous_step_direction
+    cdef double [:, :] current_view = current
+    cdef double [:, :] aon_view = aon
+
+    biconjugate_reductions_cython(reductions_view, vdf_der_view, step_direction_view, previous_step_direction_view,
+                                  current_view, aon_view, stpsz, c)
+
+
+@cython.wraparound(False)
+@cython.embedsignature(True)
+@cython.boundscheck(False)
+cpdef void biconjugate_reductions_cython(double[:] reductions,
+                                         double[:] vdf_der,
+                                         double[:, :] step_direction,
+                                         double[:, :] previous_step_direction,
+                                         double[:, :] current,
+                                         double[:, :] aon,
+                                         double stepsize,
+                                         int cores):
+    # Adds the vdf_der-weighted sums for mu numerator, mu denominator, nu numerator and nu denominator
+    # (in this order) to the first four positions of reductions
+    cdef long long i, j
+    cdef long long l = step_direction.shape[0]
+    cdef long long k = step_direction.shape[1]
+    cdef double x, y, z, w
+    cdef double mu_numerator = 0
+    cdef double mu_denominator = 0
+    cdef double nu_numerator = 0
+    cdef double nu_denominator = 0
+
+    for i in prange(l, nogil=True, num_threads=cores):
+        x = 0
+        y = 0
+        z = 0
+        w = 0
+        for j in range(k):
+            x = x + step_direction[i, j] * stepsize + previous_step_direction[i, j] * (1.0 - stepsize) - current[i, j]
+            y = y + aon[i, j] - current[i, j]
+            z = z + step_direction[i, j] - current[i, j]
+            w = w + previous_step_direction[i, j] - step_direction[i, j]
+        mu_numerator += vdf_der[i] * x * y
+        mu_denominator += vdf_der[i] * x * w
+        nu_numerator += vdf_der[i] * z * y
+        nu_denominator += vdf_der[i] * z * z
+
+    reductions[0] += mu_numerator
+    reductions[1] += mu_denominator
+    reductions[2] += nu_numerator
+    reductions[3] += nu_denominator
+
+
+
+def conjugate_step_direction(pre_previous, step_direction, aon, totals, stepsize, cores):
+    cdef double stpsz
+    cdef int c
+    c = cores
+
+    stpsz = float(stepsize)
+    cdef double [:, :] pre_previous_view = pre_previous
+    cdef double [:, :] step_direction_view = step_direction
+    cdef double [:, :] aon_view = aon
+    cdef double [:] totals_view = totals
+
+    conjugate_step_direction_cython(pre_previous_view, step_direction_view, aon_view, totals_view, stpsz, c)
+
+
+@cython.wraparound(False)
+@cython.embedsignature(True)
+@cython.boundscheck(False)
+cpdef void conjugate_step_direction_cython(double[:, :] pre_previous,
+                                           double[:, :] step_direction,
+                                           double[:, :] aon,
+                                           double[:] totals,
+                                           double stepsize,
+                                           int cores):
+    # Saves the step direction into pre_previous, combines it with the AoN and totals it by link in a single pass
+    cdef long long i, j
+    cdef long long l = step_direction.shape[0]
+    cdef long long k = step_direction.shape[1]
+    cdef double complement = 1.0 - stepsize
+    cdef double value
+
+    for i in prange(l, nogil=True, num_threads=cores):
+        totals[i] = 0
+        for j in range(k):
+            value = step_direction[i, j]
+            pre_previous[i, j] = value
+            value = value * stepsize + aon[i, j] * complement
+            step_direction[i, j] = value
+            totals[i] += value
+
+
+
+def aggregate_one_dimension(aggregate, source, scale, cores):
+    cdef double sc
+    cdef int c
+    c = cores
+
+    sc = float(scale)
+    cdef double [:] aggregate_view = aggregate
+    cdef double [:] source_view = source
+
+    aggregate_one_dimension_cython(aggregate_view, source_view, sc, c)
+
+
+@cython.wraparound(False)
+@cython.embedsignature(True)
+@cython.boundscheck(False)
+cpdef void aggregate_one_dimension_cython(double[:] aggregate,
+                                          double[:] source,
+                                          double scale,
+                                          int cores):
+    cdef long long i
+    cdef long long l = aggregate.shape[0]
+
+    for i in prange(l, nogil=True, num_threads=cores):
+        aggregate[i] += scale * source[i]
+
+
+
+def total_costs(costs, congested_time, aon_flows, current_flows, cores):
+    cdef int c
+    c = cores
+
+    cdef double [:] costs_view = costs
+    cdef double [:] congested_time_view = congested_time
+    cdef double [:] aon_flows_view = aon_flows
+    cdef double [:] current_flows_view = current_flows
+
+    total_costs_cython(costs_view, congested_time_view, aon_flows_view, current_flows_view, c)
+
+
+@cython.wraparound(False)
+@cython.embedsignature(True)
+@cython.boundscheck(False)
+cpdef void total_costs_cython(double[:] costs,
+                              double[:] congested_time,
+                              double[:] aon_flows,
+                              double[:] current_flows,
+                              int cores):
+    # Total system cost of the AoN and of the current solution go to the first two positions of costs
+    cdef long long i
+    cdef long long l = congested_time.shape[0]
+    cdef double aon_cost = 0
+    cdef double current_cost = 0
+
+    for i in prange(l, nogil=True, num_threads=cores):
+        aon_cost += congested_time[i] * aon_flows[i]
+        current_cost += congested_time[i] * current_flows[i]
+
+    costs[0] = aon_cost
+    costs[1] = current_cost
+
+
+
+def sum_axis1_classes(totals, multiples, scales, cores):
+    cdef int c
+    c = cores
+
+    cdef double [:] totals_view = totals
+    cdef double [:, :, :] multiples_view = multiples
+    cdef double [:] scales_view = scales
+
+    sum_axis1_classes_cython(totals_view, multiples_view, scales_view, c)
+
+
+@cython.wraparound(False)
+@cython.embedsignature(True)
+@cython.boundscheck(False)
+cpdef void sum_axis1_classes_cython(double[:] totals,
+                                    double[:, :, :] multiples,
+                                    double[:] scales,
+                                    int cores):
+  # multiples is indexed by (class, link, user class) and scales has one entry per class
+  cdef long long i, j, m
+  cdef long long n = multiples.shape[0]
+  cdef long long l = totals.shape[0]
+  cdef long long k = multiples.shape[2]
+
+  for i in prange(l, nogil=True, num_threads=cores):
+      totals[i] = 0
+      for m in range(n):
+          for j in range(k):
+              totals[i] += scales[m] * multiples[m, i, j]
@@ -53,7 +53,7 @@ else:
         Extension(
             "AoN",
             ["AoN.pyx"],
-            extra_compile_args=['-fopenmp'],
+            extra_compile_args=['-fopenmp', '-O3'],
             extra_link_args=['-fopenmp'],
             include_dirs=[np.get_include()],
         )
@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+from unittest import TestCase
+import numpy as np
+from scipy.optimize import root_scalar
+from aequilibrae.paths.linear_approximation import LinearApproximation
+from aequilibrae.paths.vdf import VDF
+
+
+class TestLinearApproximation(TestCase):
+    def setUp(self) -> None:
+        rng = np.random.RandomState(42)
+        links = 200
+
+        # A bare instance with only the arrays used by the stepsize search
+        self.la = LinearApproximation.__new__(LinearApproximation)
+        self.la.vdf = VDF()
+        self.la.vdf.function = 'BPR'
+        self.la.capacity = rng.uniform(500, 2000, links)
+        self.la.free_flow_tt = rng.uniform(1, 10, links)
+        alpha = rng.uniform(0.1, 1.0, links)
+        beta = rng.choice([1.0, 2.0, 4.0], links)
+        self.la.vdf_parameters = [alpha, beta]
+        self.la.bpr_exponents = [(int(b), beta == b) for b in np.unique(beta)]
+
+        self.la.fw_total_flow = rng.uniform(0, 1500, links)
+        # Loads everything on the cheapest links, as an all-or-nothing would
+        times = self.la.free_flow_tt * (1 + alpha * (self.la.fw_total_flow / self.la.capacity) ** beta)
+        aon = np.zeros(links)
+        aon[np.argsort(times)[:20]] = self.la.fw_total_flow.sum() / 20
+        self.la.flow_delta = aon - self.la.fw_total_flow
+
+        self.la.congested_value = np.zeros(links)
+        self.la.step_flow = np.zeros(links)
+        self.la.stepsize = 1.0
+
+    def test_polynomial_stepsize(self):
+        derivative = self.la._LinearApproximation__derivative_of_objective
+        self.assertLess(derivative(0.0), 0)
+        self.assertGreater(derivative(1.0), 0)
+        expected = root_scalar(derivative, bracket=[0, 1], xtol=1e-14).root
+
+        self.assertTrue(self.la._LinearApproximation__polynomial_stepsize())
+        self.assertAlmostEqual(self.la.stepsize, expected, 10, 'Polynomial stepsize does not match root finder')
+
+    def test_polynomial_stepsize_null_direction(self):
+        self.la.flow_delta.fill(0)
+
+        self.assertTrue(self.la._LinearApproximation__polynomial_stepsize())
+        self.assertEqual(self.la.stepsize, 0, 'Null direction should result in a null step')
+
+    def test_polynomial_stepsize_no_sign_change(self):
+        self.la.flow_delta = np.abs(self.la.flow_delta)
+
+        with self.assertRaises(ValueError):
+            self.la._LinearApproximation__polynomial_stepsize()
+
+    def __conjugate_setup(self, step_direction, aon):
+        step_direction = np.array(step_direction, dtype=np.float64).reshape(-1, 1)
+        aon = np.array(aon, dtype=np.float64).reshape(-1, 1)
+        links = step_direction.shape[0]
+
+        # Unit derivatives, so alpha is the ratio between the plain sums of the conjugate terms
+        def apply_derivative(vdf_der, *args):
+            vdf_der.fill(1.0)
+
+        self.la.vdf = SimpleNamespace(apply_derivative=apply_derivative)
+        self.la.fw_total_flow = np.zeros(links)
+        self.la.capacity = np.ones(links)
+        self.la.free_flow_tt = np.ones(links)
+        self.la.vdf_parameters = [np.ones(links), np.ones(links)]
+        self.la.vdf_der = np.zeros(links)
+        self.la.prev_dir_minus_current_sol = np.zeros(links)
+        self.la.aon_minus_current_sol = np.zeros(links)
+        self.la.aon_minus_prev_dir = np.zeros(links)
+        self.la.cores = 1
+        self.la.conjugate_direction_max = 0.99999
+
+        c = SimpleNamespace(mode='c', results=SimpleNamespace(link_loads=np.zeros((links, 1))),
+                            _aon_results=SimpleNamespace(link_loads=aon))
+        self.la.traffic_classes = [c]
+        self.la.step_direction = {'c': SimpleNamespace(link_loads=step_direction)}
+
+    def test_calculate_conjugate_stepsize(self):
+        # numerator = 1 * -1 and denominator = 1 * -2
+        self.__conjugate_setup([1.0], [-1.0])
+        self.la.calculate_conjugate_stepsize()
+        self.assertAlmostEqual(self.la.conjugate_stepsize, 0.5, 12, 'Wrong conjugate stepsize')
+
+        # numerator = 1 and denominator = -1, so alpha is negative
+        self.__conjugate_setup([1.0, 1.0], [-2.0, 3.0])
+        self.la.calculate_conjugate_stepsize()
+        self.assertEqual(self.la.conjugate_stepsize, 0.0, 'Negative conjugate stepsize was not clamped')
+
+        # numerator = 3 and denominator = 1, so alpha is above the maximum
+        self.__conjugate_setup([1.0, 1.0], [4.0, -1.0])
+        self.la.calculate_conjugate_stepsize()
+        self.assertEqual(self.la.conjugate_stepsize, self.la.conjugate_direction_max,
+                         'Conjugate stepsize was not clamped to its maximum')
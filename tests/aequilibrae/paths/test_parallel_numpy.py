@@ -1,7 +1,11 @@
 import unittest
 import numpy as np
 from aequilibrae.paths.AoN import copy_one_dimension, sum_axis1, linear_combination, linear_combination_skims
+from aequilibrae.paths.AoN import sum_axis1_classes
+from aequilibrae.paths.AoN import sum_axis1_aggregate, aggregate_one_dimension, conjugate_step_direction
 from aequilibrae.paths.AoN import copy_two_dimensions, copy_three_dimensions
+from aequilibrae.paths.AoN import triple_linear_combination, triple_linear_combination_skims
+from aequilibrae.paths.AoN import conjugate_reductions, biconjugate_reductions, total_costs
 
 
 class TestParallel(unittest.TestCase):
@@ -13,6 +17,26 @@ class TestParallel(unittest.TestCase):
         sum_axis1(target, source, 1)
         self.assertEqual((b - target).max(), 0, 'Sum Axis 1 failed')
 
+    def test_sum_axis1_aggregate(self):
+        target = np.zeros(50)
+        aggregate = np.random.rand(50)
+        source = np.random.rand(200).reshape(50, 4)
+        b = np.sum(source, axis=1)
+        expected = aggregate + 1.5 * b
+
+        sum_axis1_aggregate(target, aggregate, source, 1.5, 1)
+        self.assertEqual((b - target).max(), 0, 'Sum Axis 1 failed')
+        self.assertTrue(np.allclose(aggregate, expected), 'Aggregating the sum over axis 1 failed')
+
+    def test_sum_axis1_classes(self):
+        target = np.random.rand(50)
+        source = np.random.rand(600).reshape(3, 50, 4)
+        scales = np.array([1.0, 2.5, 0.5])
+        expected = np.einsum('kij,k->i', source, scales)
+
+        sum_axis1_classes(target, source, scales, 1)
+        self.assertTrue(np.allclose(target, expected), 'Sum over classes and axis 1 failed')
+
     def test_linear_combination(self):
         target = np.zeros((50, 1))
         source = np.random.rand(50).reshape(50, 1)
@@ -28,10 +52,43 @@ class TestParallel(unittest.TestCase):
         self.assertEqual((source - target * 5 / 4).max(), 0, 'Linear combination failed')
 
     def test_triple_linear_combination(self):
-        pass
+        target = np.zeros((50, 3))
+        sources = [np.random.rand(150).reshape(50, 3) for _ in range(3)]
+        betas = np.array([0.5, 0.3, 0.2])
+
+        triple_linear_combination(target, sources[0], sources[1], sources[2], betas, 1)
+        expected = sources[0] * 0.5 + sources[1] * 0.3 + sources[2] * 0.2
+        self.assertTrue(np.allclose(target, expected), 'Triple linear combination failed')
 
     def test_triple_linear_combination_skims(self):
-        pass
+        target = np.zeros((5, 5, 2))
+        sources = [np.random.rand(50).reshape(5, 5, 2) for _ in range(3)]
+        betas = np.array([0.5, 0.3, 0.2])
+
+        triple_linear_combination_skims(target, sources[0], sources[1], sources[2], betas, 1)
+        expected = sources[0] * 0.5 + sources[1] * 0.3 + sources[2] * 0.2
+        self.assertTrue(np.allclose(target, expected), 'Triple linear combination for skims failed')
+
+    def test_conjugate_step_direction(self):
+        pre_previous = np.zeros((50, 3))
+        step_direction = np.random.rand(150).reshape(50, 3)
+        aon = np.random.rand(150).reshape(50, 3)
+        totals = np.zeros(50)
+        original = np.array(step_direction, copy=True)
+
+        conjugate_step_direction(pre_previous, step_direction, aon, totals, 0.3, 1)
+
+        self.assertTrue(np.array_equal(pre_previous, original), 'Previous step direction was not preserved')
+        self.assertTrue(np.allclose(step_direction, original * 0.3 + aon * 0.7), 'Step direction update failed')
+        self.assertTrue(np.allclose(totals, np.sum(step_direction, axis=1)), 'Step direction totals are wrong')
+
+    def test_aggregate_one_dimension(self):
+        aggregate = np.random.rand(50)
+        source = np.random.rand(50)
+        expected = aggregate + 2.5 * source
+
+        aggregate_one_dimension(aggregate, source, 2.5, 1)
+        self.assertTrue(np.allclose(aggregate, expected), 'Aggregating one dimension failed')
 
     def test_copy_one_dimension(self):
         target = np.zeros(50)
@@ -63,6 +120,52 @@ class TestParallel(unittest.TestCase):
         if target.sum() == 0:
             self.fail('Target and source are the other way around for copying one dimension')
 
+    def test_conjugate_reductions(self):
+        step_direction = np.random.rand(150).reshape(50, 3)
+        current = np.random.rand(150).reshape(50, 3)
+        aon = np.random.rand(150).reshape(50, 3)
+        prev_minus_current = np.zeros(50)
+        aon_minus_current = np.zeros(50)
+        aon_minus_prev = np.zeros(50)
+
+        conjugate_reductions(prev_minus_current, aon_minus_current, aon_minus_prev, step_direction, current, aon, 1)
+
+        self.assertTrue(np.allclose(prev_minus_current, np.sum(step_direction - current, axis=1)),
+                        'Difference between previous direction and current solution is wrong')
+        self.assertTrue(np.allclose(aon_minus_current, np.sum(aon - current, axis=1)),
+                        'Difference between AoN and current solution is wrong')
+        self.assertTrue(np.allclose(aon_minus_prev, np.sum(aon - step_direction, axis=1)),
+                        'Difference between AoN and previous direction is wrong')
+
+    def test_biconjugate_reductions(self):
+        step_direction = np.random.rand(150).reshape(50, 3)
+        previous_step_direction = np.random.rand(150).reshape(50, 3)
+        current = np.random.rand(150).reshape(50, 3)
+        aon = np.random.rand(150).reshape(50, 3)
+        vdf_der = np.random.rand(50)
+        stepsize = 0.3
+        reductions = np.zeros(4)
+
+        biconjugate_reductions(reductions, vdf_der, step_direction, previous_step_direction, current, aon, stepsize, 1)
+
+        x = np.sum(step_direction * stepsize + previous_step_direction * (1.0 - stepsize) - current, axis=1)
+        y = np.sum(aon - current, axis=1)
+        z = np.sum(step_direction - current, axis=1)
+        w = np.sum(previous_step_direction - step_direction, axis=1)
+        expected = [np.sum(vdf_der * x * y), np.sum(vdf_der * x * w), np.sum(vdf_der * z * y), np.sum(vdf_der * z * z)]
+        self.assertTrue(np.allclose(reductions, expected), 'Biconjugate reductions are wrong')
+
+    def test_total_costs(self):
+        congested_time = np.random.rand(50)
+        aon_flows = np.random.rand(50)
+        current_flows = np.random.rand(50)
+        costs = np.zeros(2)
+
+        total_costs(costs, congested_time, aon_flows, current_flows, 1)
+
+        self.assertAlmostEqual(costs[0], np.sum(congested_time * aon_flows), msg='AoN total cost is wrong')
+        self.assertAlmostEqual(costs[1], np.sum(congested_time * current_flows), msg='Current total cost is wrong')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,6 @@
 from unittest import TestCase
 import os
+import copy
 import string
 import random
 import zipfile
@@ -7,6 +8,7 @@ import numpy as np
 from aequilibrae.matrix import AequilibraeMatrix
 from aequilibrae.project import Project
 from aequilibrae import TrafficAssignment, TrafficClass, Graph
+from aequilibrae.paths.AoN import sum_axis1_aggregate
 
 from ...data import siouxfalls_project, siouxfalls_demand, data_folder
 
@@ -165,3 +167,65 @@ class TestTrafficAssignment(TestCase):
         self.assertLess(fw25, msa25)
         self.assertLess(cfw25, fw25)
         self.assertLess(bfw25, cfw25)
+
+    def test_execute_multiple_classes(self):
+        second_graph = copy.deepcopy(self.car_graph)
+        second_graph.mode = 'x'
+        second_class = TrafficClass(second_graph, self.matrix)
+        classes = [self.assigclass, second_class]
+
+        self.assignment.set_classes(classes)
+        # Enough cores for the classes to be processed concurrently
+        self.assignment.set_cores(2)
+        cores = [c._aon_results.cores for c in classes]
+        self.assignment.set_vdf("BPR")
+        self.assignment.set_vdf_parameters({"alpha": "b", "beta": "power"})
+        self.assignment.set_capacity_field("capacity")
+        self.assignment.set_time_field("free_flow_time")
+        self.assignment.max_iter = 5
+        self.assignment.set_algorithm('bfw')
+        self.assignment.execute()
+
+        self.assertEqual(self.assignment.assignment.class_cores, 1, 'Cores were not split among classes')
+        self.assertListEqual(cores, [c._aon_results.cores for c in classes], 'AoN cores were not restored')
+        self.assertIsNone(self.assignment.assignment.pool, 'Thread pool was not released')
+
+        # An error in one of the classes must still release the pool and restore the cores
+        second_class._aon_results.__graph_id__ = None
+        with self.assertRaises(ValueError):
+            self.assignment.execute()
+        self.assertListEqual(cores, [c._aon_results.cores for c in classes], 'AoN cores were not restored')
+        self.assertIsNone(self.assignment.assignment.pool, 'Thread pool was not released')
+
+    def test_execute_biconjugate_step_direction_flow(self):
+        second_graph = copy.deepcopy(self.car_graph)
+        second_graph.mode = 'x'
+        second_class = TrafficClass(second_graph, self.matrix)
+        classes = [self.assigclass, second_class]
+
+        self.assignment.set_classes(classes)
+        self.assignment.set_vdf("BPR")
+        self.assignment.set_vdf_parameters({"alpha": "b", "beta": "power"})
+        self.assignment.set_capacity_field("capacity")
+        self.assignment.set_time_field("free_flow_time")
+        self.assignment.max_iter = 5
+        self.assignment.set_algorithm('bfw')
+        # PCEs changed after setting the algorithm must still be used
+        second_class.set_pce(3.0)
+        self.assignment.execute()
+
+        la = self.assignment.assignment
+        self.assertIsNotNone(la.step_direction_loads, 'Step directions were not consolidated')
+
+        # Forces a biconjugate step, which is the one that aggregates the consolidated step directions
+        la.iter = la.max_iter + 1
+        la.stepsize = 0.5
+        la.do_fw_step = False
+        la.do_conjugate_step = False
+        la._LinearApproximation__calculate_step_direction()
+
+        expected = np.zeros_like(la.step_direction_flow)
+        for c in classes:
+            stp_dir = la.step_direction[c.mode]
+            sum_axis1_aggregate(np.zeros_like(expected), expected, stp_dir.link_loads, c.pce, 1)
+        self.assertTrue(np.allclose(la.step_direction_flow, expected), 'Wrong aggregate step direction flow')